@@ -3,9 +3,13 @@ Transcriptor de audio para SekretariaBot.
 Usa Gemini 3 Flash Preview para convertir audio a texto.
 """
 
+import io
 import os
-from pathlib import Path
-import tempfile
+import asyncio
+import shutil
+import subprocess
+from functools import lru_cache
+from typing import BinaryIO, Optional, Union
 
 from dotenv import load_dotenv
 
@@ -18,8 +22,28 @@ except ImportError:
     GEMINI_AVAILABLE = False
 
 
+def _leer_speed() -> float:
+    """Lee TRANSCRIBE_SPEED; si no es un número válido para atempo, usa 1.0."""
+    try:
+        speed = float(os.getenv('TRANSCRIBE_SPEED', '1.5'))
+    except ValueError:
+        return 1.0
+    return speed if 0.5 <= speed <= 2.0 else 1.0
+
+
+# Factor de aceleración del audio antes de transcribir (1.0 = sin cambios)
+TRANSCRIBE_SPEED = _leer_speed()
+
+# Tiempo máximo para acelerar un audio con ffmpeg (segundos)
+FFMPEG_TIMEOUT = 30
+
+
+@lru_cache(maxsize=1)
 def get_gemini_client():
-    """Obtiene el cliente de Gemini configurado."""
+    """
+    Obtiene el cliente de Gemini configurado.
+    Se crea una sola vez y se reutiliza (conexión HTTPS incluida).
+    """
     if not GEMINI_AVAILABLE:
         return None
     
@@ -30,12 +54,16 @@ def get_gemini_client():
     return genai.Client(api_key=api_key)
 
 
-def transcribir_audio(audio_path: str) -> dict:
+def transcribir_audio(
+    audio: Union[str, BinaryIO],
+    mime_type: Optional[str] = None
+) -> dict:
     """
-    Transcribe un archivo de audio a texto usando Gemini.
+    Transcribe un audio a texto usando Gemini.
     
     Args:
-        audio_path: Ruta al archivo de audio
+        audio: Ruta al archivo de audio o buffer en memoria
+        mime_type: Tipo MIME del audio (obligatorio si es un buffer)
     
     Returns:
         Diccionario con texto transcrito o error
@@ -55,7 +83,8 @@ def transcribir_audio(audio_path: str) -> dict:
     
     try:
         # Subir archivo de audio
-        audio_file = client.files.upload(file=audio_path)
+        config = {'mime_type': mime_type} if mime_type else None
+        audio_file = client.files.upload(file=audio, config=config)
         
         # Transcribir con Gemini
         response = client.models.generate_content(
@@ -77,33 +106,70 @@ def transcribir_audio(audio_path: str) -> dict:
         }
 
 
-async def transcribir_audio_telegram(voice_file, bot) -> dict:
+def acelerar_audio(datos: bytes, speed: float) -> bytes:
+    """
+    Acelera un audio ogg con ffmpeg para reducir el tiempo de transcripción.
+    Si ffmpeg no está disponible o falla, devuelve el audio original.
+    
+    Args:
+        datos: Contenido del audio ogg
+        speed: Factor de aceleración (atempo admite 0.5 - 2.0)
+    
+    Returns:
+        Audio acelerado en formato ogg/opus
+    """
+    if speed == 1.0 or not shutil.which('ffmpeg'):
+        return datos
+    
+    try:
+        proceso = subprocess.run(
+            [
+                'ffmpeg', '-loglevel', 'error',
+                '-i', 'pipe:0',
+                '-filter:a', f'atempo={speed}',
+                '-vn', '-c:a', 'libopus', '-f', 'ogg',
+                'pipe:1',
+            ],
+            input=datos,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True,
+            timeout=FFMPEG_TIMEOUT,
+        )
+        return proceso.stdout or datos
+    except (OSError, subprocess.CalledProcessError, subprocess.TimeoutExpired):
+        return datos
+
+
+def _acelerar_y_transcribir(datos: bytes, speed: float) -> dict:
+    """Acelera el audio y lo transcribe (bloqueante)."""
+    buffer = io.BytesIO(acelerar_audio(datos, speed))
+    return transcribir_audio(buffer, mime_type='audio/ogg')
+
+
+async def transcribir_audio_telegram(
+    voice_file,
+    bot,
+    speed: float = TRANSCRIBE_SPEED
+) -> dict:
     """
     Descarga y transcribe un mensaje de voz de Telegram.
     
     Args:
         voice_file: Objeto de archivo de voz de Telegram
         bot: Instancia del bot de Telegram
+        speed: Factor de aceleración previo a la transcripción
     
     Returns:
         Diccionario con texto transcrito o error
     """
     try:
-        # Crear archivo temporal
-        with tempfile.NamedTemporaryFile(suffix='.ogg', delete=False) as tmp:
-            tmp_path = tmp.name
-        
-        # Descargar el archivo de voz
+        # Descargar el archivo de voz directamente a memoria
         file = await bot.get_file(voice_file.file_id)
-        await file.download_to_drive(tmp_path)
-        
-        # Transcribir con Gemini
-        resultado = transcribir_audio(tmp_path)
-        
-        # Limpiar archivo temporal
-        Path(tmp_path).unlink(missing_ok=True)
+        datos = bytes(await file.download_as_bytearray())
         
-        return resultado
+        # ffmpeg y Gemini son bloqueantes: se ejecutan en un hilo
+        return await asyncio.to_thread(_acelerar_y_transcribir, datos, speed)
     except Exception as e:
         return {
             'success': False,
@@ -117,3 +183,4 @@ if __name__ == '__main__':
     if GEMINI_AVAILABLE:
         api_key = os.getenv('GEMINI_API_KEY')
         print(f"GEMINI_API_KEY configurada: {'Sí' if api_key else 'No'}")
+    print(f"ffmpeg disponible: {bool(shutil.which('ffmpeg'))} (velocidad {TRANSCRIBE_SPEED}x)")
@@ -14,6 +14,8 @@ from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 
+from ejecucion.calendar_service import guardar_token
+
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 PROJECT_ROOT = Path(__file__).parent.parent
 CREDENTIALS_FILE = PROJECT_ROOT / 'credentials.json'
@@ -48,9 +50,10 @@ def autorizar():
             return
         elif creds and creds.expired and creds.refresh_token:
             print("\n🔄 Refrescando token expirado...")
+            token_original = creds.token
             creds.refresh(Request())
-            with open(TOKEN_FILE, 'w') as token:
-                token.write(creds.to_json())
+            if creds.token != token_original:
+                guardar_token(creds, TOKEN_FILE)
             print("✅ Token refrescado!")
             return
     
@@ -64,8 +67,7 @@ def autorizar():
     creds = flow.run_local_server(port=0)
     
     # Guardar token
-    with open(TOKEN_FILE, 'w') as token:
-        token.write(creds.to_json())
+    guardar_token(creds, TOKEN_FILE)
     
     print(f"\n✅ ¡Autorización exitosa!")
     print(f"   Token guardado en: {TOKEN_FILE}")
@@ -5,16 +5,31 @@ Maneja autenticación OAuth y operaciones CRUD de eventos.
 
 import os
 import json
+import time
+import asyncio
+import calendar
+import functools
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, NamedTuple
 from pathlib import Path
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+# httpx (con HTTP/2) es opcional: si no está, se usa httplib2 por defecto
+try:
+    import httpx
+    import httplib2
+    import google_auth_httplib2
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
 # Scope para acceso completo al calendario
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 
@@ -26,18 +41,152 @@ TOKEN_FILE = PROJECT_ROOT / 'token.json'
 # Zona horaria por defecto
 DEFAULT_TIMEZONE = 'America/Bogota'
 
+# Campos que realmente se usan de cada respuesta (respuesta parcial)
+CAMPOS_LISTA = 'items(id,summary,start,end,location,status),nextPageToken'
+CAMPOS_EVENTO = 'id,summary,start,htmlLink'
 
-def get_calendar_service():
+# Duraciones habituales precalculadas
+_DUR_CACHE = {n: timedelta(minutes=n) for n in (15, 30, 45, 60, 90, 120)}
+
+# Máximo de peticiones por lote que acepta la API de Calendar
+MAX_BATCH = 50
+
+
+def _duracion(minutos: int) -> timedelta:
+    """Devuelve un timedelta para la duración, reutilizando los habituales."""
+    return _DUR_CACHE.get(minutos) or timedelta(minutes=minutos)
+
+
+def guardar_token(creds: Credentials, destino: Path = TOKEN_FILE) -> None:
     """
-    Obtiene el servicio de Google Calendar autenticado.
-    Maneja el flujo OAuth si es necesario.
+    Guarda las credenciales en disco de forma atómica.
+    Escribe a un archivo temporal único y lo renombra, para no dejar
+    un token.json corrupto si el proceso se interrumpe o si dos
+    escritores coinciden.
+    """
+    fd, tmp = tempfile.mkstemp(dir=destino.parent, prefix=destino.name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(creds.to_json().encode())
+        os.replace(tmp, destino)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class _HttpxHttp:
+    """
+    Adaptador con la interfaz de httplib2.Http sobre un httpx.Client,
+    para que googleapiclient reutilice una conexión HTTP/2 compartida.
+    """
+    
+    def __init__(self, client: 'httpx.Client'):
+        self._client = client
+    
+    def request(self, uri, method='GET', body=None, headers=None,
+                redirections=5, connection_type=None):
+        respuesta = self._client.request(
+            method, uri,
+            content=body,
+            headers=headers,
+            follow_redirects=redirections > 0,
+        )
+        info = dict(respuesta.headers)
+        # httpx ya descomprimió el contenido
+        info.pop('content-encoding', None)
+        info.pop('content-length', None)
+        info['status'] = respuesta.status_code
+        return httplib2.Response(info), respuesta.content
+
+
+# Cliente httpx compartido; el lock evita crear (y perder) varios en frío
+_httpx_client = None
+_httpx_lock = threading.Lock()
+
+
+def _get_http(creds: Credentials):
+    """
+    Devuelve el transporte HTTP autenticado sobre httpx (HTTP/2),
+    o None si httpx/h2 no están instalados.
+    """
+    global _httpx_client, HTTPX_AVAILABLE
+    if not HTTPX_AVAILABLE:
+        return None
+    
+    if _httpx_client is None:
+        with _httpx_lock:
+            if _httpx_client is None:
+                try:
+                    _httpx_client = httpx.Client(
+                        http2=True,
+                        limits=httpx.Limits(max_keepalive_connections=8),
+                        timeout=30.0,
+                    )
+                except ImportError:
+                    # Falta el paquete h2 para HTTP/2: usar httplib2 en adelante
+                    HTTPX_AVAILABLE = False
+                    return None
+    
+    return google_auth_httplib2.AuthorizedHttp(creds, http=_HttpxHttp(_httpx_client))
+
+
+# google-auth da el token por vencido REFRESH_THRESHOLD antes de expirar
+# (creds.valid pasa a False y AuthorizedHttp lo refrescaría por su cuenta,
+# sin lock ni guardado). El margen debe superarlo para que el refresco
+# ocurra siempre en _obtener_credenciales.
+try:
+    from google.auth._helpers import REFRESH_THRESHOLD
+    _UMBRAL_GOOGLE = REFRESH_THRESHOLD.total_seconds()
+except (ImportError, AttributeError):
+    _UMBRAL_GOOGLE = 225
+
+# Margen antes de la expiración del token para refrescarlo (segundos)
+MARGEN_EXPIRACION = _UMBRAL_GOOGLE + 15
+
+
+def _expiracion(creds: Credentials) -> float:
+    """Momento (epoch) a partir del cual hay que revisar el token de nuevo."""
+    if creds.expiry is None:
+        return float('inf')
+    # creds.expiry es un datetime UTC sin zona horaria
+    return calendar.timegm(creds.expiry.timetuple()) - MARGEN_EXPIRACION
+
+
+# Credenciales compartidas entre hilos; el lock evita que varios hilos
+# carguen o refresquen el token a la vez
+_service_cache = {'creds': None, 'expira': 0.0}
+_service_lock = threading.Lock()
+
+# Servicio por hilo: httplib2.Http (transporte por defecto) no es thread-safe
+_service_local = threading.local()
+
+
+def invalidar_servicio() -> None:
+    """Descarta las credenciales en caché (p. ej. tras guardar un token nuevo)."""
+    with _service_lock:
+        _service_cache.update(creds=None, expira=0.0)
+
+
+def _obtener_credenciales() -> Credentials:
+    """
+    Devuelve credenciales válidas, cargándolas o refrescándolas si hace falta.
+    Debe llamarse con _service_lock tomado.
     """
-    creds = None
+    creds = _service_cache['creds']
+    
+    # Otro hilo pudo haberlas refrescado mientras se esperaba el lock
+    if creds is not None and time.time() < _service_cache['expira']:
+        return creds
     
     # Cargar token existente
-    if TOKEN_FILE.exists():
+    if creds is None and TOKEN_FILE.exists():
         creds = Credentials.from_authorized_user_file(str(TOKEN_FILE), SCOPES)
     
+    token_original = creds.token if creds else None
+    
     # Si no hay credenciales válidas, hacer flujo OAuth
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
@@ -48,19 +197,75 @@ def get_calendar_service():
                     f"No se encontró {CREDENTIALS_FILE}. "
                     "Descarga las credenciales de Google Cloud Console."
                 )
+            # Solo hace falta en la primera autorización: import perezoso
+            from google_auth_oauthlib.flow import InstalledAppFlow
             flow = InstalledAppFlow.from_client_secrets_file(
                 str(CREDENTIALS_FILE), SCOPES
             )
             creds = flow.run_local_server(port=0)
         
-        # Guardar token para próximas ejecuciones
-        with open(TOKEN_FILE, 'w') as token:
-            token.write(creds.to_json())
+        # Guardar token para próximas ejecuciones (solo si cambió)
+        if creds.token != token_original:
+            guardar_token(creds)
     
-    return build('calendar', 'v3', credentials=creds)
+    _service_cache['creds'] = creds
+    _service_cache['expira'] = _expiracion(creds)
+    return creds
 
 
-def crear_evento(
+def get_calendar_service():
+    """
+    Obtiene el servicio de Google Calendar autenticado.
+    Maneja el flujo OAuth si es necesario.
+    Cada hilo construye su servicio una sola vez y lo reutiliza
+    mientras las credenciales compartidas sigan siendo las mismas.
+    """
+    svc = getattr(_service_local, 'svc', None)
+    
+    # Camino rápido: servicio del hilo en caché y token lejos de expirar
+    if (svc is not None
+            and _service_local.creds is _service_cache['creds']
+            and time.time() < _service_cache['expira']):
+        return svc
+    
+    with _service_lock:
+        creds = _obtener_credenciales()
+    
+    # Reconstruir el servicio del hilo solo si cambiaron las credenciales
+    if svc is None or _service_local.creds is not creds:
+        http = _get_http(creds)
+        if http is not None:
+            svc = build(
+                'calendar', 'v3',
+                http=http,
+                cache_discovery=False,
+                static_discovery=True,
+            )
+        else:
+            svc = build(
+                'calendar', 'v3',
+                credentials=creds,
+                cache_discovery=False,
+                static_discovery=True,
+            )
+        _service_local.svc = svc
+        _service_local.creds = creds
+    
+    return svc
+
+
+class CalResult(NamedTuple):
+    """Resultado de una operación de escritura en el calendario."""
+    success: bool
+    id: str = ''
+    titulo: str = ''
+    inicio: Optional[str] = None
+    link: Optional[str] = None
+    mensaje: str = ''
+    error: str = ''
+
+
+def _construir_evento(
     titulo: str,
     fecha_inicio: datetime,
     duracion_minutos: int = 60,
@@ -69,24 +274,8 @@ def crear_evento(
     participantes: List[str] = None,
     timezone: str = DEFAULT_TIMEZONE
 ) -> Dict[str, Any]:
-    """
-    Crea un nuevo evento en Google Calendar.
-    
-    Args:
-        titulo: Nombre del evento
-        fecha_inicio: Fecha y hora de inicio
-        duracion_minutos: Duración en minutos (default 60)
-        descripcion: Descripción opcional
-        ubicacion: Ubicación opcional
-        participantes: Lista de emails para invitar
-        timezone: Zona horaria
-    
-    Returns:
-        Diccionario con info del evento creado (id, link, etc.)
-    """
-    service = get_calendar_service()
-    
-    fecha_fin = fecha_inicio + timedelta(minutes=duracion_minutos)
+    """Construye el cuerpo de un evento para la API de Calendar."""
+    fecha_fin = fecha_inicio + _duracion(duracion_minutos)
     
     evento = {
         'summary': titulo,
@@ -105,25 +294,123 @@ def crear_evento(
     if participantes:
         evento['attendees'] = [{'email': email} for email in participantes]
     
+    return evento
+
+
+def _resultado_creado(evento_creado: Dict[str, Any]) -> CalResult:
+    """Resume la respuesta de la API tras crear un evento."""
+    return CalResult(
+        success=True,
+        id=evento_creado['id'],
+        titulo=evento_creado['summary'],
+        inicio=evento_creado['start'].get('dateTime'),
+        link=evento_creado.get('htmlLink'),
+    )
+
+
+def crear_evento(
+    titulo: str,
+    fecha_inicio: datetime,
+    duracion_minutos: int = 60,
+    descripcion: str = "",
+    ubicacion: str = "",
+    participantes: List[str] = None,
+    timezone: str = DEFAULT_TIMEZONE
+) -> CalResult:
+    """
+    Crea un nuevo evento en Google Calendar.
+    
+    Args:
+        titulo: Nombre del evento
+        fecha_inicio: Fecha y hora de inicio
+        duracion_minutos: Duración en minutos (default 60)
+        descripcion: Descripción opcional
+        ubicacion: Ubicación opcional
+        participantes: Lista de emails para invitar
+        timezone: Zona horaria
+    
+    Returns:
+        CalResult con info del evento creado (id, link, etc.)
+    """
+    service = get_calendar_service()
+    
+    evento = _construir_evento(
+        titulo, fecha_inicio, duracion_minutos,
+        descripcion, ubicacion, participantes, timezone
+    )
+    
     try:
         evento_creado = service.events().insert(
             calendarId='primary',
             body=evento,
-            sendUpdates='all' if participantes else 'none'
+            sendUpdates='all' if participantes else 'none',
+            fields=CAMPOS_EVENTO
         ).execute()
         
-        return {
-            'success': True,
-            'id': evento_creado['id'],
-            'titulo': evento_creado['summary'],
-            'inicio': evento_creado['start'].get('dateTime'),
-            'link': evento_creado.get('htmlLink'),
-        }
+        return _resultado_creado(evento_creado)
     except HttpError as e:
-        return {
-            'success': False,
-            'error': str(e),
-        }
+        return CalResult(success=False, error=str(e))
+
+
+def _ejecutar_en_lotes(peticiones: List[Any], formatear) -> List[CalResult]:
+    """
+    Ejecuta peticiones de la API agrupadas en lotes de hasta MAX_BATCH.
+    
+    Args:
+        peticiones: Peticiones ya construidas (sin ejecutar)
+        formatear: Función que convierte (índice, respuesta) en resultado
+    
+    Returns:
+        Lista de resultados en el mismo orden que las peticiones
+    """
+    service = get_calendar_service()
+    resultados: Dict[str, CalResult] = {}
+    
+    def _collect(request_id, response, exception):
+        if exception is not None:
+            resultados[request_id] = CalResult(success=False, error=str(exception))
+        else:
+            resultados[request_id] = formatear(int(request_id), response)
+    
+    for inicio in range(0, len(peticiones), MAX_BATCH):
+        batch = service.new_batch_http_request(callback=_collect)
+        for i, peticion in enumerate(peticiones[inicio:inicio + MAX_BATCH], start=inicio):
+            batch.add(peticion, request_id=str(i))
+        try:
+            batch.execute()
+        except HttpError as e:
+            for i in range(inicio, min(inicio + MAX_BATCH, len(peticiones))):
+                resultados.setdefault(str(i), CalResult(success=False, error=str(e)))
+    
+    return [
+        resultados.get(str(i), CalResult(success=False, error='Sin respuesta'))
+        for i in range(len(peticiones))
+    ]
+
+
+def crear_eventos_batch(eventos: List[Dict[str, Any]]) -> List[CalResult]:
+    """
+    Crea varios eventos agrupando las peticiones en lotes.
+    
+    Args:
+        eventos: Lista de diccionarios con los argumentos de crear_evento
+    
+    Returns:
+        Lista de resultados (mismo formato que crear_evento), en orden
+    """
+    service = get_calendar_service()
+    
+    peticiones = [
+        service.events().insert(
+            calendarId='primary',
+            body=_construir_evento(**datos),
+            sendUpdates='all' if datos.get('participantes') else 'none',
+            fields=CAMPOS_EVENTO
+        )
+        for datos in eventos
+    ]
+    
+    return _ejecutar_en_lotes(peticiones, lambda i, respuesta: _resultado_creado(respuesta))
 
 
 def listar_eventos(
@@ -156,7 +443,8 @@ def listar_eventos(
             timeMax=fecha_fin.isoformat() + 'Z',
             maxResults=max_resultados,
             singleEvents=True,
-            orderBy='startTime'
+            orderBy='startTime',
+            fields=CAMPOS_LISTA
         ).execute()
         
         resultado = []
@@ -185,7 +473,7 @@ def editar_evento(
     nueva_descripcion: str = None,
     nueva_ubicacion: str = None,
     timezone: str = DEFAULT_TIMEZONE
-) -> Dict[str, Any]:
+) -> CalResult:
     """
     Edita un evento existente.
     
@@ -203,64 +491,62 @@ def editar_evento(
     service = get_calendar_service()
     
     try:
-        # Obtener evento actual
-        evento = service.events().get(
-            calendarId='primary',
-            eventId=evento_id
-        ).execute()
-        
-        # Actualizar campos
+        # Solo se envían los campos que cambian
+        cambios = {}
         if nuevo_titulo:
-            evento['summary'] = nuevo_titulo
+            cambios['summary'] = nuevo_titulo
         if nueva_descripcion:
-            evento['description'] = nueva_descripcion
+            cambios['description'] = nueva_descripcion
         if nueva_ubicacion:
-            evento['location'] = nueva_ubicacion
+            cambios['location'] = nueva_ubicacion
         
         if nueva_fecha:
             # Calcular duración original o usar la nueva
-            inicio_original = datetime.fromisoformat(
-                evento['start']['dateTime'].replace('Z', '+00:00')
-            )
-            fin_original = datetime.fromisoformat(
-                evento['end']['dateTime'].replace('Z', '+00:00')
-            )
-            duracion = nueva_duracion or int((fin_original - inicio_original).seconds / 60)
+            duracion = nueva_duracion
+            if not duracion:
+                evento = service.events().get(
+                    calendarId='primary',
+                    eventId=evento_id,
+                    fields='start,end'
+                ).execute()
+                # Python 3.11+ acepta el sufijo 'Z' directamente
+                inicio_original = datetime.fromisoformat(evento['start']['dateTime'])
+                fin_original = datetime.fromisoformat(evento['end']['dateTime'])
+                duracion = int((fin_original - inicio_original).seconds / 60)
             
-            evento['start'] = {
+            cambios['start'] = {
                 'dateTime': nueva_fecha.isoformat(),
                 'timeZone': timezone,
             }
-            evento['end'] = {
-                'dateTime': (nueva_fecha + timedelta(minutes=duracion)).isoformat(),
+            cambios['end'] = {
+                'dateTime': (nueva_fecha + _duracion(duracion)).isoformat(),
                 'timeZone': timezone,
             }
         
-        evento_actualizado = service.events().update(
+        evento_actualizado = service.events().patch(
             calendarId='primary',
             eventId=evento_id,
-            body=evento
+            body=cambios,
+            fields='id,summary'
         ).execute()
         
-        return {
-            'success': True,
-            'id': evento_actualizado['id'],
-            'titulo': evento_actualizado['summary'],
-            'mensaje': 'Evento actualizado correctamente',
-        }
+        return CalResult(
+            success=True,
+            id=evento_actualizado['id'],
+            titulo=evento_actualizado['summary'],
+            mensaje='Evento actualizado correctamente',
+        )
     except HttpError as e:
-        return {
-            'success': False,
-            'error': str(e),
-        }
+        return CalResult(success=False, error=str(e))
 
 
-def eliminar_evento(evento_id: str) -> Dict[str, Any]:
+def eliminar_evento(evento_id: str, titulo: Optional[str] = None) -> CalResult:
     """
     Elimina un evento del calendario.
     
     Args:
         evento_id: ID del evento a eliminar
+        titulo: Título ya conocido por quien llama (solo para el mensaje)
     
     Returns:
         Resultado de la operación
@@ -268,27 +554,43 @@ def eliminar_evento(evento_id: str) -> Dict[str, Any]:
     service = get_calendar_service()
     
     try:
-        # Obtener info del evento antes de borrar
-        evento = service.events().get(
-            calendarId='primary',
-            eventId=evento_id
-        ).execute()
-        titulo = evento.get('summary', 'Sin título')
-        
         service.events().delete(
             calendarId='primary',
             eventId=evento_id
         ).execute()
         
-        return {
-            'success': True,
-            'mensaje': f'Evento "{titulo}" eliminado correctamente',
-        }
+        if titulo:
+            mensaje = f'Evento "{titulo}" eliminado correctamente'
+        else:
+            mensaje = 'Evento eliminado correctamente'
+        
+        return CalResult(success=True, id=evento_id, titulo=titulo or '', mensaje=mensaje)
     except HttpError as e:
-        return {
-            'success': False,
-            'error': str(e),
-        }
+        return CalResult(success=False, error=str(e))
+
+
+def eliminar_eventos_batch(evento_ids: List[str]) -> List[CalResult]:
+    """
+    Elimina varios eventos agrupando las peticiones en lotes.
+    
+    Args:
+        evento_ids: IDs de los eventos a eliminar
+    
+    Returns:
+        Lista de resultados (uno por ID), en orden
+    """
+    service = get_calendar_service()
+    
+    peticiones = [
+        service.events().delete(calendarId='primary', eventId=evento_id)
+        for evento_id in evento_ids
+    ]
+    
+    return _ejecutar_en_lotes(peticiones, lambda i, respuesta: CalResult(
+        success=True,
+        id=evento_ids[i],
+        mensaje='Evento eliminado correctamente',
+    ))
 
 
 def buscar_disponibilidad(
@@ -305,7 +607,7 @@ def buscar_disponibilidad(
     Returns:
         Disponibilidad y conflictos si los hay
     """
-    fecha_fin = fecha + timedelta(minutes=duracion_minutos)
+    fecha_fin = fecha + _duracion(duracion_minutos)
     eventos = listar_eventos(fecha, fecha_fin, max_resultados=5)
     
     if not eventos:
@@ -322,6 +624,58 @@ def buscar_disponibilidad(
         }
 
 
+# Variantes asíncronas: ejecutan la llamada bloqueante en un pool de hilos
+# propio para no congelar el event loop del bot. El semáforo limita las
+# peticiones simultáneas a Google para no agotar la cuota.
+CAL_MAX_WORKERS = 8
+_CAL_POOL = ThreadPoolExecutor(max_workers=CAL_MAX_WORKERS, thread_name_prefix='cal')
+_CAL_SEMAPHORE = asyncio.Semaphore(CAL_MAX_WORKERS)
+
+
+async def _en_pool(func, *args, **kwargs):
+    """Ejecuta func en el pool de Calendar sin bloquear el event loop."""
+    async with _CAL_SEMAPHORE:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _CAL_POOL, functools.partial(func, *args, **kwargs)
+        )
+
+
+async def crear_evento_async(*args, **kwargs) -> CalResult:
+    """Versión asíncrona de crear_evento."""
+    return await _en_pool(crear_evento, *args, **kwargs)
+
+
+async def crear_eventos_batch_async(*args, **kwargs) -> List[CalResult]:
+    """Versión asíncrona de crear_eventos_batch."""
+    return await _en_pool(crear_eventos_batch, *args, **kwargs)
+
+
+async def listar_eventos_async(*args, **kwargs) -> List[Dict[str, Any]]:
+    """Versión asíncrona de listar_eventos."""
+    return await _en_pool(listar_eventos, *args, **kwargs)
+
+
+async def editar_evento_async(*args, **kwargs) -> CalResult:
+    """Versión asíncrona de editar_evento."""
+    return await _en_pool(editar_evento, *args, **kwargs)
+
+
+async def eliminar_evento_async(*args, **kwargs) -> CalResult:
+    """Versión asíncrona de eliminar_evento."""
+    return await _en_pool(eliminar_evento, *args, **kwargs)
+
+
+async def eliminar_eventos_batch_async(*args, **kwargs) -> List[CalResult]:
+    """Versión asíncrona de eliminar_eventos_batch."""
+    return await _en_pool(eliminar_eventos_batch, *args, **kwargs)
+
+
+async def buscar_disponibilidad_async(*args, **kwargs) -> Dict[str, Any]:
+    """Versión asíncrona de buscar_disponibilidad."""
+    return await _en_pool(buscar_disponibilidad, *args, **kwargs)
+
+
 if __name__ == '__main__':
     # Test rápido
     print("Probando conexión a Google Calendar...")
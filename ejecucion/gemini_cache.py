@@ -0,0 +1,159 @@
+"""
+Caché de contexto de Gemini para instrucciones de sistema fijas.
+Compartido por intent_parser y gemini_responder.
+"""
+
+import asyncio
+import threading
+import time
+from typing import AsyncIterator, Optional
+
+try:
+    from google.genai import errors, types
+    GEMINI_AVAILABLE = True
+except ImportError:
+    GEMINI_AVAILABLE = False
+
+
+# Tokens mínimos que Gemini exige para crear un caché explícito
+CACHE_MIN_TOKENS = 1024
+CACHE_TTL_SEGUNDOS = 3600
+
+# Espera antes de reintentar tras un error transitorio (segundos)
+REINTENTO_SEGUNDOS = 60
+
+
+def _es_rechazo(e: Exception) -> bool:
+    """True si Gemini rechazó la petición (error 4xx que no es de cuota)."""
+    return isinstance(e, errors.ClientError) and e.code != 429
+
+
+def _cache_perdido(e: Exception) -> bool:
+    """True si el error indica que el caché ya no existe (expiró o se borró)."""
+    return isinstance(e, errors.ClientError) and e.code in (403, 404)
+
+
+class SystemCache:
+    """
+    Caché de contexto para una instrucción de sistema fija.
+    Solo se crea si la instrucción alcanza CACHE_MIN_TOKENS; un rechazo de
+    Gemini lo desactiva y un error transitorio solo pospone el reintento.
+    """
+
+    def __init__(self, modelo: str, instruccion: str):
+        self.modelo = modelo
+        self.instruccion = instruccion
+        self._nombre: Optional[str] = None
+        self._expira = 0.0
+        self._reintento = 0.0
+        self._tokens_ok = False
+        self._disponible = GEMINI_AVAILABLE
+        self._lock = threading.Lock()
+
+    def nombre(self, client) -> Optional[str]:
+        """Nombre del caché vigente (creándolo si hace falta), o None si no se usa."""
+        if not self._disponible:
+            return None
+
+        ahora = time.monotonic()
+        if self._nombre is not None and ahora < self._expira:
+            return self._nombre
+        if ahora < self._reintento:
+            return None
+
+        with self._lock:
+            # Otro hilo pudo haberlo creado mientras se esperaba el lock
+            if self._nombre is not None and time.monotonic() < self._expira:
+                return self._nombre
+            if not self._disponible:
+                return None
+
+            try:
+                if not self._tokens_ok:
+                    total = client.models.count_tokens(
+                        model=self.modelo,
+                        contents=self.instruccion
+                    ).total_tokens
+                    if total < CACHE_MIN_TOKENS:
+                        self._disponible = False
+                        return None
+                    self._tokens_ok = True
+
+                cache = client.caches.create(
+                    model=self.modelo,
+                    config=types.CreateCachedContentConfig(
+                        system_instruction=self.instruccion,
+                        ttl=f'{CACHE_TTL_SEGUNDOS}s',
+                    )
+                )
+            except Exception as e:
+                if _es_rechazo(e):
+                    self._disponible = False
+                else:
+                    self._reintento = time.monotonic() + REINTENTO_SEGUNDOS
+                return None
+
+            self._nombre = cache.name
+            # Margen para no usar un caché a punto de expirar
+            self._expira = time.monotonic() + CACHE_TTL_SEGUNDOS - 60
+            return self._nombre
+
+    def generar(self, client, contenido: str):
+        """Llama a generate_content usando el caché si está disponible."""
+        nombre = self.nombre(client)
+        if nombre:
+            try:
+                return client.models.generate_content(
+                    model=self.modelo,
+                    contents=contenido,
+                    config=types.GenerateContentConfig(cached_content=nombre)
+                )
+            except Exception as e:
+                # Solo se reintenta sin caché si el caché desapareció
+                if not _cache_perdido(e):
+                    raise
+                self._nombre = None
+
+        return client.models.generate_content(
+            model=self.modelo,
+            contents=[self.instruccion, contenido]
+        )
+
+    async def generar_stream(self, client, contenido: str) -> AsyncIterator:
+        """
+        Versión en streaming de generar (cliente asíncrono): devuelve los
+        chunks a medida que llegan.
+        """
+        nombre = None
+        if self._disponible:
+            if self._nombre is not None and time.monotonic() < self._expira:
+                nombre = self._nombre
+            else:
+                # Puede crear el caché: fuera del event loop
+                nombre = await asyncio.to_thread(self.nombre, client)
+
+        if nombre:
+            recibido = False
+            try:
+                stream = await client.aio.models.generate_content_stream(
+                    model=self.modelo,
+                    contents=contenido,
+                    config=types.GenerateContentConfig(cached_content=nombre)
+                )
+                # La petición se hace al iterar: los errores llegan aquí
+                async for chunk in stream:
+                    recibido = True
+                    yield chunk
+                return
+            except Exception as e:
+                # Solo se reintenta sin caché si desapareció y no llegó nada
+                if recibido or not _cache_perdido(e):
+                    raise
+                self._nombre = None
+
+        stream = await client.aio.models.generate_content_stream(
+            model=self.modelo,
+            contents=[self.instruccion, contenido]
+        )
+        async for chunk in stream:
+            yield chunk
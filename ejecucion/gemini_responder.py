@@ -4,10 +4,13 @@ Usa Gemini 3 Flash Preview para crear mensajes naturales.
 """
 
 import os
-from typing import Dict, Any, List
+from functools import lru_cache
+from typing import Dict, Any, AsyncIterator, List
 
 from dotenv import load_dotenv
 
+from ejecucion.gemini_cache import SystemCache
+
 load_dotenv()
 
 try:
@@ -17,6 +20,8 @@ except ImportError:
     GEMINI_AVAILABLE = False
 
 
+GEMINI_MODEL = "gemini-3-flash-preview"
+
 PERSONALIDAD = """Eres SekretariaBot, una asistente virtual amigable y profesional.
 Tu estilo:
 - Amable y cálida, usa emojis con moderación (📅, ✅, 🕐)
@@ -24,9 +29,16 @@ Tu estilo:
 - Breve y directa
 """
 
+# Caché de contexto para PERSONALIDAD (solo si alcanza el mínimo de tokens)
+_SYSTEM_CACHE = SystemCache(GEMINI_MODEL, PERSONALIDAD)
 
+
+@lru_cache(maxsize=1)
 def get_gemini_client():
-    """Obtiene el cliente de Gemini configurado."""
+    """
+    Obtiene el cliente de Gemini configurado.
+    Se crea una sola vez y se reutiliza (conexión HTTPS incluida).
+    """
     if not GEMINI_AVAILABLE:
         return None
     
@@ -37,6 +49,13 @@ def get_gemini_client():
     return genai.Client(api_key=api_key)
 
 
+class _Default(dict):
+    """Diccionario que devuelve '' para claves faltantes al formatear templates."""
+    
+    def __missing__(self, key):
+        return ''
+
+
 # Templates base (fallback)
 TEMPLATES = {
     'evento_creado': "✅ Listo! Agendé '{titulo}' para el {fecha} a las {hora}.",
@@ -52,6 +71,29 @@ TEMPLATES = {
 }
 
 
+def _prompt_respuesta(tipo: str, datos: Dict[str, Any]) -> str:
+    """Construye el prompt para generar una respuesta."""
+    return f"""Genera una respuesta para:
+Tipo: {tipo}
+Datos: {datos}
+
+Respuesta corta (1-2 oraciones), amigable. Solo texto plano con emojis.
+"""
+
+
+def _respuesta_template(tipo: str, datos: Dict[str, Any]) -> str:
+    """Respuesta de respaldo usando los templates base."""
+    template = TEMPLATES.get(tipo, "Operación completada.")
+    return template.format_map(_Default(datos))
+
+
+def _agregar_fuente(respuesta: str, datos: Dict[str, Any], incluir_fuente: bool) -> str:
+    """Agrega el ID del evento a la respuesta si se pidió."""
+    if incluir_fuente and datos.get('id'):
+        respuesta += f"\n\n📋 ID: {datos['id']}"
+    return respuesta
+
+
 def generar_respuesta(tipo: str, datos: Dict[str, Any], incluir_fuente: bool = False) -> str:
     """
     Genera una respuesta amigable según el tipo de acción.
@@ -68,39 +110,63 @@ def generar_respuesta(tipo: str, datos: Dict[str, Any], incluir_fuente: bool = F
     
     # Si Gemini está disponible, generar respuesta más natural
     if client:
-        prompt = f"""{PERSONALIDAD}
-
-Genera una respuesta para:
-Tipo: {tipo}
-Datos: {datos}
-
-Respuesta corta (1-2 oraciones), amigable. Solo texto plano con emojis.
-"""
         try:
-            response = client.models.generate_content(
-                model="gemini-3-flash-preview",
-                contents=prompt
-            )
-            respuesta = response.text.strip()
-            
-            if incluir_fuente and datos.get('id'):
-                respuesta += f"\n\n📋 ID: {datos['id']}"
-            
-            return respuesta
+            response = _SYSTEM_CACHE.generar(client, _prompt_respuesta(tipo, datos))
+            return _agregar_fuente(response.text.strip(), datos, incluir_fuente)
         except Exception:
             pass
     
     # Fallback a template
-    template = TEMPLATES.get(tipo, "Operación completada.")
-    try:
-        respuesta = template.format(**datos)
-    except KeyError:
-        respuesta = template
+    return _agregar_fuente(_respuesta_template(tipo, datos), datos, incluir_fuente)
+
+
+async def generar_respuesta_stream(
+    tipo: str,
+    datos: Dict[str, Any],
+    incluir_fuente: bool = False
+) -> AsyncIterator[str]:
+    """
+    Genera una respuesta amigable en streaming.
     
-    if incluir_fuente and datos.get('id'):
-        respuesta += f"\n\n📋 ID: {datos['id']}"
+    Args:
+        tipo: Tipo de respuesta
+        datos: Datos relevantes
+        incluir_fuente: Si incluir info técnica (ID)
     
-    return respuesta
+    Yields:
+        El texto acumulado hasta el momento; el último valor es la respuesta final
+        (el template si el stream falla, aunque ya hubieran llegado fragmentos)
+    """
+    client = get_gemini_client()
+    
+    if client:
+        prompt = _prompt_respuesta(tipo, datos)
+        texto = ''
+        completo = False
+        try:
+            async for chunk in _SYSTEM_CACHE.generar_stream(client, prompt):
+                if chunk.text:
+                    texto += chunk.text
+                    # Telegram rechaza mensajes vacíos (p. ej. si el primer chunk es "\n")
+                    if texto.strip():
+                        yield texto.strip()
+            completo = True
+        except Exception:
+            pass
+        
+        # Un stream cortado no se da por respuesta final
+        if completo and texto.strip():
+            yield _agregar_fuente(texto.strip(), datos, incluir_fuente)
+            return
+    
+    # Fallback a template
+    yield _agregar_fuente(_respuesta_template(tipo, datos), datos, incluir_fuente)
+
+
+def _hora_evento(evento: Dict[str, Any]) -> str:
+    """Extrae HH:MM de un inicio ISO-8601 (vacío si es un evento de día completo)."""
+    inicio = evento.get('inicio') or ''
+    return inicio[11:16] if len(inicio) >= 16 and inicio[10:11] == 'T' else ''
 
 
 def formatear_lista_eventos(eventos: List[Dict[str, Any]]) -> str:
@@ -108,12 +174,9 @@ def formatear_lista_eventos(eventos: List[Dict[str, Any]]) -> str:
     if not eventos:
         return "📭 No tienes eventos programados."
     
-    lineas = []
-    for evento in eventos:
-        hora = evento.get('inicio', '').split('T')[1][:5] if 'T' in evento.get('inicio', '') else ''
-        lineas.append(f"• {hora} - {evento['titulo']}")
-    
-    return "\n".join(lineas)
+    return "\n".join(
+        f"• {_hora_evento(evento)} - {evento['titulo']}" for evento in eventos
+    )
 
 
 def mensaje_confirmacion(accion: str, evento: str) -> str:
@@ -3,14 +3,20 @@ Parser de intenciones para SekretariaBot.
 Usa Gemini 3 Flash Preview para detectar intención y extraer entidades.
 """
 
+import asyncio
+import copy
 import os
+from functools import lru_cache
 import json
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 import re
+import threading
 
 from dotenv import load_dotenv
 
+from ejecucion.gemini_cache import SystemCache
+
 load_dotenv()
 
 try:
@@ -19,6 +25,15 @@ try:
 except ImportError:
     GEMINI_AVAILABLE = False
 
+# orjson es opcional: si no está, se usa json de la librería estándar
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+
+GEMINI_MODEL = "gemini-3-flash-preview"
 
 # Prompt del sistema para Gemini
 SYSTEM_PROMPT = """Eres un asistente que analiza mensajes para detectar intenciones de calendario.
@@ -62,9 +77,37 @@ Reglas:
 - Si el mensaje no tiene que ver con calendario, intencion = "otro"
 """
 
+# Caché de contexto para SYSTEM_PROMPT (solo si alcanza el mínimo de tokens)
+_SYSTEM_CACHE = SystemCache(GEMINI_MODEL, SYSTEM_PROMPT)
+
+
+# Expresiones precompiladas para limpiar la respuesta del modelo
+_RE_FENCE_HEAD = re.compile(r'^```\w*\n?')
+_RE_FENCE_TAIL = re.compile(r'\n?```$')
+_RE_JSON = re.compile(r'\{.*\}', re.DOTALL)
+
+# Intenciones ya analizadas por (texto normalizado, día); acotado, FIFO
+INTENCIONES_CACHE_MAX = 1024
+_intenciones_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_intenciones_lock = threading.Lock()
+
+# Horas relativas ("en dos horas", "dentro de 30 minutos"): dependen de la
+# hora actual, así que esos mensajes no se guardan en caché
+_RE_HORA_RELATIVA = re.compile(
+    r'\b(?:dentro de|en (?:\w+ )?(?:media )?(?:minutos?|horas?)'
+    r'|ahora|ahorita|al rato|m[aá]s tarde|luego)\b'
+)
 
+# Referencias relativas de fecha -> días a sumar
+_FECHAS_RELATIVAS = {'hoy': 0, 'mañana': 1, 'pasado mañana': 2}
+
+
+@lru_cache(maxsize=1)
 def get_gemini_client():
-    """Obtiene el cliente de Gemini configurado."""
+    """
+    Obtiene el cliente de Gemini configurado.
+    Se crea una sola vez y se reutiliza (conexión HTTPS incluida).
+    """
     if not GEMINI_AVAILABLE:
         return None
     
@@ -75,6 +118,25 @@ def get_gemini_client():
     return genai.Client(api_key=api_key)
 
 
+@lru_cache(maxsize=64)
+def _contexto(iso_minuto: str, mensaje: str) -> str:
+    """
+    Construye el contexto temporal del prompt.
+    
+    Args:
+        iso_minuto: Fecha actual en ISO truncada al minuto (YYYY-MM-DDTHH:MM:00)
+        mensaje: Texto del usuario
+    """
+    dia_semana = datetime.fromisoformat(iso_minuto).strftime('%A')
+    return f"""
+Fecha actual: {iso_minuto[:10]}
+Día de la semana: {dia_semana}
+Hora actual: {iso_minuto[11:16]}
+
+Mensaje del usuario: {mensaje}
+"""
+
+
 def parsear_intencion(mensaje: str, fecha_actual: datetime = None) -> Dict[str, Any]:
     """
     Analiza un mensaje y extrae la intención y entidades.
@@ -102,30 +164,24 @@ def parsear_intencion(mensaje: str, fecha_actual: datetime = None) -> Dict[str,
             'error': 'GEMINI_API_KEY no configurada en .env'
         }
     
-    # Contexto temporal
-    contexto = f"""
-Fecha actual: {fecha_actual.strftime('%Y-%m-%d')}
-Día de la semana: {fecha_actual.strftime('%A')}
-Hora actual: {fecha_actual.strftime('%H:%M')}
-
-Mensaje del usuario: {mensaje}
-"""
+    # Contexto temporal (cacheado por minuto y mensaje)
+    contexto = _contexto(
+        fecha_actual.replace(second=0, microsecond=0).isoformat(),
+        mensaje
+    )
     
     try:
-        response = client.models.generate_content(
-            model="gemini-3-flash-preview",
-            contents=f"{SYSTEM_PROMPT}\n\n{contexto}"
-        )
+        response = _SYSTEM_CACHE.generar(client, contexto)
         
         # Parsear respuesta JSON
         text = response.text.strip()
         
         # Limpiar posibles bloques de código
         if text.startswith('```'):
-            text = re.sub(r'^```\w*\n?', '', text)
-            text = re.sub(r'\n?```$', '', text)
+            text = _RE_FENCE_HEAD.sub('', text)
+            text = _RE_FENCE_TAIL.sub('', text)
         
-        resultado = json.loads(text)
+        resultado = json_loads(text)
         resultado['success'] = True
         
         # Resolver fechas relativas
@@ -139,9 +195,12 @@ Mensaje del usuario: {mensaje}
     
     except json.JSONDecodeError:
         try:
-            json_match = re.search(r'\{.*\}', response.text, re.DOTALL)
-            if json_match:
-                resultado = json.loads(json_match.group())
+            json_texto = _extraer_json(response.text)
+            if json_texto is None:
+                json_match = _RE_JSON.search(response.text)
+                json_texto = json_match.group() if json_match else None
+            if json_texto:
+                resultado = json_loads(json_texto)
                 resultado['success'] = True
                 return resultado
         except:
@@ -159,23 +218,109 @@ Mensaje del usuario: {mensaje}
         }
 
 
-def resolver_fecha(fecha_str: str, fecha_actual: datetime) -> str:
-    """Resuelve referencias de fecha relativas."""
-    fecha_str_lower = fecha_str.lower()
+def parsear_intencion_cacheada(mensaje: str, fecha_actual: datetime = None) -> Dict[str, Any]:
+    """
+    Igual que parsear_intencion, pero reutiliza el resultado si el mismo
+    texto ya se analizó hoy. Solo se guardan los resultados exitosos y
+    que no dependen de la hora actual.
     
-    if fecha_str_lower == 'hoy':
-        return fecha_actual.strftime('%Y-%m-%d')
-    elif fecha_str_lower == 'mañana':
-        return (fecha_actual + timedelta(days=1)).strftime('%Y-%m-%d')
-    elif fecha_str_lower == 'pasado mañana':
-        return (fecha_actual + timedelta(days=2)).strftime('%Y-%m-%d')
+    Args:
+        mensaje: Texto del usuario
+        fecha_actual: Fecha actual para resolver referencias relativas
     
-    try:
-        datetime.strptime(fecha_str, '%Y-%m-%d')
-        return fecha_str
-    except ValueError:
-        pass
+    Returns:
+        Copia del diccionario con intención, entidades y metadata
+    """
+    if fecha_actual is None:
+        fecha_actual = datetime.now()
+    
+    # El día forma parte de la clave: "mañana" cambia a medianoche
+    texto = mensaje.strip().lower()
+    if _RE_HORA_RELATIVA.search(texto):
+        return parsear_intencion(mensaje, fecha_actual)
+    
+    clave = (texto, fecha_actual.date().isoformat())
+    with _intenciones_lock:
+        resultado = _intenciones_cache.get(clave)
+    
+    if resultado is None:
+        resultado = parsear_intencion(mensaje, fecha_actual)
+        if not resultado.get('success'):
+            return resultado
+        with _intenciones_lock:
+            if len(_intenciones_cache) >= INTENCIONES_CACHE_MAX:
+                del _intenciones_cache[next(iter(_intenciones_cache))]
+            _intenciones_cache[clave] = resultado
+    
+    return copy.deepcopy(resultado)
+
+
+async def parsear_intencion_batch(
+    mensajes: List[str],
+    fecha_actual: datetime = None
+) -> List[Dict[str, Any]]:
+    """
+    Analiza varios mensajes en paralelo (una llamada a Gemini por hilo).
+    
+    Args:
+        mensajes: Textos del usuario
+        fecha_actual: Fecha actual para resolver referencias relativas
+    
+    Returns:
+        Resultados de parsear_intencion, en el mismo orden
+    """
+    if fecha_actual is None:
+        fecha_actual = datetime.now()
+    
+    return await asyncio.gather(*(
+        asyncio.to_thread(parsear_intencion_cacheada, mensaje, fecha_actual)
+        for mensaje in mensajes
+    ))
+
+
+def _extraer_json(texto: str) -> Optional[str]:
+    """
+    Extrae el primer objeto JSON completo del texto en una sola pasada.
+    Cuenta llaves ignorando las que aparecen dentro de strings.
+    
+    Returns:
+        El objeto como texto, o None si no hay uno balanceado
+    """
+    inicio = texto.find('{')
+    if inicio == -1:
+        return None
+    
+    profundidad = 0
+    en_string = False
+    escapado = False
+    for i in range(inicio, len(texto)):
+        c = texto[i]
+        if en_string:
+            if escapado:
+                escapado = False
+            elif c == '\\':
+                escapado = True
+            elif c == '"':
+                en_string = False
+        elif c == '"':
+            en_string = True
+        elif c == '{':
+            profundidad += 1
+        elif c == '}':
+            profundidad -= 1
+            if profundidad == 0:
+                return texto[inicio:i + 1]
+    
+    return None
+
+
+def resolver_fecha(fecha_str: str, fecha_actual: datetime) -> str:
+    """Resuelve referencias de fecha relativas."""
+    dias = _FECHAS_RELATIVAS.get(fecha_str.lower())
+    if dias is not None:
+        return (fecha_actual + timedelta(days=dias)).strftime('%Y-%m-%d')
     
+    # Fechas absolutas (YYYY-MM-DD) u otros textos se devuelven tal cual
     return fecha_str
 
 
@@ -4,37 +4,53 @@ Coordina todos los módulos: transcripción, parsing de intención, calendario y
 """
 
 import os
+import re
+import asyncio
+import time
 import logging
-from datetime import datetime
-from typing import Dict, Any
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Any, Awaitable, Callable, List, NamedTuple, Optional
 
 from dotenv import load_dotenv
 
 # Cargar variables de entorno
 load_dotenv()
 
+
+def _nivel_log() -> int:
+    """Lee LOG_LEVEL; si no es un nivel de logging válido, usa WARNING."""
+    nivel = logging.getLevelName(os.getenv('LOG_LEVEL', 'WARNING').strip().upper())
+    return nivel if isinstance(nivel, int) else logging.WARNING
+
+
 # Configurar logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO
+    level=_nivel_log()
 )
 logger = logging.getLogger(__name__)
 
 # Importar módulos de ejecución
 from ejecucion.audio_transcriber import transcribir_audio_telegram
-from ejecucion.intent_parser import parsear_intencion, es_intencion_calendario
+from ejecucion.intent_parser import (
+    parsear_intencion_cacheada, parsear_intencion_batch, es_intencion_calendario
+)
 from ejecucion.calendar_service import (
-    crear_evento, listar_eventos, editar_evento, 
-    eliminar_evento, buscar_disponibilidad
+    crear_evento_async, listar_eventos_async, editar_evento_async,
+    eliminar_evento_async, buscar_disponibilidad_async
 )
 from ejecucion.gemini_responder import (
-    generar_respuesta, formatear_lista_eventos,
+    generar_respuesta_stream, formatear_lista_eventos,
     mensaje_confirmacion, mensaje_bienvenida
 )
 
 # Importar telegram
 try:
     from telegram import Update
+    from telegram.error import RetryAfter, TelegramError
     from telegram.ext import (
         Application, CommandHandler, MessageHandler, 
         ContextTypes, filters
@@ -42,10 +58,153 @@ try:
     TELEGRAM_AVAILABLE = True
 except ImportError:
     TELEGRAM_AVAILABLE = False
+    RetryAfter = TelegramError = Exception
     logger.error("python-telegram-bot no instalado. Ejecuta: pip install python-telegram-bot")
 
+# Normalización de texto: minúsculas, sin tildes y espacios simples
+_WS_RE = re.compile(r'\s+')
+_LOWER_TABLE = str.maketrans('ÁÉÍÓÚÜÑáéíóúüñ', 'aeiouunaeiouun')
+
+
+def _norm(s: str) -> str:
+    """Normaliza un texto para comparaciones (tildes, mayúsculas, espacios)."""
+    return _WS_RE.sub(' ', s.translate(_LOWER_TABLE).lower()).strip()
+
+
+# Respuestas que confirman una acción pendiente (ya normalizadas)
+_AFFIRMATIVE = frozenset({
+    'si', 'yes', 'confirmo', 'ok',
+    'si.', 'dale', 'vale', 'claro',
+})
+
+# Formatos de fecha/hora para las respuestas
+FORMATO_FECHA = '%d/%m/%Y'
+FORMATO_HORA = '%H:%M'
+
+# Respuesta de consulta de eventos: fecha y lista formateada
+_TPL_CONSULTA = "📅 Eventos del %s:\n\n%s"
+
+# Separador de mensajes múltiples (uno o más renglones en blanco)
+_RE_BLOQUES = re.compile(r'\n\s*\n')
+
+# Aviso cuando un mensaje múltiple trae más de una acción a confirmar
+_TPL_UNA_CONFIRMACION = (
+    "⚠️ Solo puedo confirmar una acción por mensaje. "
+    "Vuelve a pedirme '%s' después de responder a la anterior."
+)
+
+# Intervalo mínimo entre ediciones de un mensaje en streaming (segundos)
+STREAM_EDIT_INTERVALO = 0.4
+
+# Fechas ya convertidas por (fecha, hora); acotado, FIFO
+FECHAS_CACHE_MAX = 512
+_fechas_cache: Dict[tuple, datetime] = {}
+
+# Vigencia de la lista de próximos eventos en caché (segundos)
+EVENTOS_TTL = 30
+
+# A partir de cuántos eventos se busca sobre el buffer de títulos concatenados
+BUSQUEDA_BUFFER_MIN = 32
+
 # Estado de conversación por usuario (para confirmaciones pendientes)
-user_states: Dict[int, Dict[str, Any]] = {}
+# Acotado (LRU) y con expiración para no acumular estados abandonados
+USER_STATES_MAX = 10_000
+ESTADO_TTL = 300
+
+
+@dataclass(slots=True)
+class PendingState:
+    """Acción pendiente de confirmación por un usuario."""
+    intencion: str
+    entidades: Dict[str, Any]
+    ts: float = field(default_factory=time.monotonic)
+    
+    def expirado(self) -> bool:
+        return time.monotonic() - self.ts > ESTADO_TTL
+
+
+user_states: 'OrderedDict[int, PendingState]' = OrderedDict()
+
+
+class Respuesta(NamedTuple):
+    """Respuesta a enviar: tipo y datos para Gemini, o un texto ya armado."""
+    tipo: str = ''
+    datos: Optional[Dict[str, Any]] = None
+    incluir_fuente: bool = False
+    texto: Optional[str] = None
+
+
+def guardar_estado(user_id: int, estado: PendingState):
+    """Guarda el estado del usuario, descartando los más antiguos si hay demasiados."""
+    user_states[user_id] = estado
+    user_states.move_to_end(user_id)
+    while len(user_states) > USER_STATES_MAX:
+        user_states.popitem(last=False)
+
+
+def obtener_estado(user_id: int) -> Optional[PendingState]:
+    """Devuelve el estado pendiente del usuario si existe y no ha expirado."""
+    estado = user_states.get(user_id)
+    if estado is not None and estado.expirado():
+        del user_states[user_id]
+        return None
+    return estado
+
+
+def _espera_retry(e: 'RetryAfter') -> float:
+    """Segundos que pide esperar Telegram (int o timedelta según la versión de PTB)."""
+    espera = e.retry_after
+    return espera.total_seconds() if isinstance(espera, timedelta) else float(espera)
+
+
+async def responder_stream(
+    message,
+    tipo: str,
+    datos: Dict[str, Any],
+    incluir_fuente: bool = False
+):
+    """
+    Responde con generar_respuesta_stream: envía el primer fragmento
+    y edita el mismo mensaje a medida que llega el resto. Las ediciones
+    intermedias son best-effort; la final se reintenta si Telegram pide esperar.
+    """
+    enviado = None
+    mostrado = ''
+    ultima_edicion = 0.0
+    texto = ''
+    
+    async for texto in generar_respuesta_stream(tipo, datos, incluir_fuente):
+        ahora = time.monotonic()
+        if enviado is None:
+            enviado = await message.reply_text(texto)
+            mostrado, ultima_edicion = texto, ahora
+        elif texto != mostrado and ahora - ultima_edicion >= STREAM_EDIT_INTERVALO:
+            ultima_edicion = ahora
+            try:
+                await enviado.edit_text(texto)
+                mostrado = texto
+            except RetryAfter as e:
+                # Control de flujo: no volver a editar hasta que pase la espera
+                ultima_edicion = ahora + _espera_retry(e)
+            except TelegramError as e:
+                logger.debug("Edición intermedia omitida: %s", e)
+    
+    if enviado is not None and texto != mostrado:
+        try:
+            await enviado.edit_text(texto)
+        except RetryAfter as e:
+            await asyncio.sleep(_espera_retry(e))
+            await enviado.edit_text(texto)
+
+
+async def responder(message, respuesta: Respuesta):
+    """Envía una Respuesta: el texto tal cual o generada en streaming."""
+    if respuesta.texto is not None:
+        await message.reply_text(respuesta.texto)
+    else:
+        await responder_stream(
+            message, respuesta.tipo, respuesta.datos or {}, respuesta.incluir_fuente
+        )
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -57,7 +216,8 @@ async def autorizar(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Comando /autorizar - Inicia flujo OAuth de Google Calendar."""
     try:
         from ejecucion.calendar_service import get_calendar_service
-        service = get_calendar_service()
+        # Puede abrir el flujo OAuth o refrescar el token: fuera del event loop
+        await asyncio.to_thread(get_calendar_service)
         await update.message.reply_text(
             "✅ ¡Autorización exitosa! Ya puedo gestionar tu calendario."
         )
@@ -74,67 +234,112 @@ async def autorizar(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Maneja mensajes de texto del usuario."""
-    user_id = update.effective_user.id
-    texto = update.message.text
+    await _procesar_texto(update.effective_user.id, update.message.text, update.message)
+
+
+async def _procesar_texto(user_id: int, texto: str, message):
+    """
+    Procesa un texto del usuario (escrito o transcrito de voz).
+    
+    Args:
+        user_id: ID de Telegram del usuario
+        texto: Texto a procesar
+        message: Mensaje de Telegram al que se responde
+    """
+    # Un solo "ahora" para todo el procesamiento del mensaje
+    now = datetime.now()
     
     # Verificar si hay una confirmación pendiente
-    if user_id in user_states and user_states[user_id].get('pendiente'):
-        respuesta = await manejar_confirmacion(user_id, texto)
-        await update.message.reply_text(respuesta)
+    if obtener_estado(user_id) is not None:
+        respuesta = await manejar_confirmacion(user_id, texto, now=now)
+        await responder(message, respuesta)
+        return
+    
+    # Varios mensajes separados por líneas en blanco se analizan en paralelo
+    bloques = [b.strip() for b in _RE_BLOQUES.split(texto) if b.strip()]
+    if len(bloques) > 1:
+        resultados = await parsear_intencion_batch(bloques, now)
+        # Solo hay un estado pendiente por usuario: una confirmación por mensaje
+        pendiente = False
+        for resultado in resultados:
+            pendiente |= await procesar_intencion(
+                message, user_id, resultado, now=now,
+                admite_confirmacion=not pendiente
+            )
         return
     
     # Parsear intención
-    resultado = parsear_intencion(texto, datetime.now())
+    resultado = await asyncio.to_thread(parsear_intencion_cacheada, texto, now)
+    await procesar_intencion(message, user_id, resultado, now=now)
+
+
+async def procesar_intencion(
+    message,
+    user_id: int,
+    resultado: Dict[str, Any],
+    now: Optional[datetime] = None,
+    admite_confirmacion: bool = True
+) -> bool:
+    """
+    Responde a una intención ya parseada (confirma o ejecuta la acción).
+    
+    Args:
+        admite_confirmacion: Si es False, una acción que requiere confirmación
+            no se guarda y se avisa al usuario
     
+    Returns:
+        True si quedó una acción pendiente de confirmación
+    """
     if not resultado.get('success'):
-        await update.message.reply_text(
-            generar_respuesta('error', {'mensaje': resultado.get('error', 'Error desconocido')})
+        await responder_stream(
+            message,
+            'error', {'mensaje': resultado.get('error', 'Error desconocido')}
         )
-        return
+        return False
     
     intencion = resultado.get('intencion', 'otro')
     entidades = resultado.get('entidades', {})
     
     # Si no es intención de calendario
     if not es_intencion_calendario(intencion):
-        await update.message.reply_text(
-            generar_respuesta('fuera_alcance', {})
-        )
-        return
+        await responder_stream(message, 'fuera_alcance', {})
+        return False
     
     # Si requiere confirmación, guardar estado y pedir
     if resultado.get('requiere_confirmacion'):
-        user_states[user_id] = {
-            'pendiente': True,
-            'intencion': intencion,
-            'entidades': entidades,
-        }
-        await update.message.reply_text(
-            mensaje_confirmacion(
-                intencion.replace('_evento', ''),
-                entidades.get('evento_referencia', entidades.get('titulo', 'este evento'))
-            )
+        evento = entidades.get('evento_referencia', entidades.get('titulo', 'este evento'))
+        if not admite_confirmacion:
+            await message.reply_text(_TPL_UNA_CONFIRMACION % evento)
+            return False
+        guardar_estado(user_id, PendingState(intencion, entidades))
+        await message.reply_text(
+            mensaje_confirmacion(intencion.replace('_evento', ''), evento)
         )
-        return
+        return True
     
-    # Ejecutar la acción
-    respuesta = await ejecutar_accion(intencion, entidades)
-    await update.message.reply_text(respuesta)
+    # Ejecutar la acción mostrando "escribiendo..." mientras responde Google
+    typing = asyncio.create_task(message.reply_chat_action('typing'))
+    respuesta = await ejecutar_accion(intencion, entidades, now=now)
+    await asyncio.gather(typing, return_exceptions=True)
+    await responder(message, respuesta)
+    return False
 
 
 async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Maneja mensajes de voz."""
     voice = update.message.voice
     
-    # Indicar que estamos procesando
-    await update.message.reply_text("🎤 Procesando audio...")
+    # Indicar que estamos procesando mientras se transcribe
+    ack = asyncio.create_task(update.message.reply_text("🎤 Procesando audio..."))
     
     # Transcribir
     resultado = await transcribir_audio_telegram(voice, context.bot)
+    await ack
     
     if not resultado.get('success'):
-        await update.message.reply_text(
-            generar_respuesta('error', {'mensaje': resultado.get('error')})
+        await responder_stream(
+            update.message,
+            'error', {'mensaje': resultado.get('error')}
         )
         return
     
@@ -142,164 +347,310 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(f"📝 Escuché: \"{texto}\"")
     
     # Procesar como texto normal
-    update.message.text = texto
-    await handle_message(update, context)
+    await _procesar_texto(update.effective_user.id, texto, update.message)
 
 
-async def manejar_confirmacion(user_id: int, respuesta: str) -> str:
+async def manejar_confirmacion(
+    user_id: int,
+    respuesta: str,
+    now: Optional[datetime] = None
+) -> Respuesta:
     """Maneja respuestas a confirmaciones pendientes."""
-    estado = user_states.get(user_id, {})
-    
-    # Limpiar estado
-    user_states.pop(user_id, None)
-    
-    respuesta_lower = respuesta.lower().strip()
+    # Tomar y limpiar estado
+    estado = user_states.pop(user_id, None)
+    if estado is None or estado.expirado():
+        return Respuesta(texto="⌛ La confirmación expiró. Vuelve a pedirme la acción.")
     
-    if respuesta_lower in ['sí', 'si', 'yes', 'confirmo', 'ok']:
+    if _norm(respuesta) in _AFFIRMATIVE:
         # Ejecutar la acción confirmada
         return await ejecutar_accion(
-            estado.get('intencion'),
-            estado.get('entidades', {})
+            estado.intencion,
+            estado.entidades,
+            now=now
         )
     else:
-        return "❌ Operación cancelada."
+        return Respuesta(texto="❌ Operación cancelada.")
 
 
-async def ejecutar_accion(intencion: str, entidades: Dict[str, Any]) -> str:
-    """Ejecuta una acción de calendario y retorna respuesta."""
+class _EventsCache:
+    """
+    Próximos eventos del calendario (compartido: el bot usa un solo calendario).
+    Se piden en una sola llamada y se reutilizan durante EVENTOS_TTL, con un
+    índice por palabra del título para buscar eventos a editar/eliminar.
+    """
     
-    try:
-        if intencion == 'crear_evento':
-            # Construir fecha/hora
-            fecha_str = entidades.get('fecha_resuelta', entidades.get('fecha'))
-            hora_str = entidades.get('hora', '09:00')
-            
-            if fecha_str and hora_str:
-                fecha_inicio = datetime.strptime(f"{fecha_str} {hora_str}", "%Y-%m-%d %H:%M")
-            else:
-                return generar_respuesta('error', {'mensaje': 'Necesito saber la fecha y hora'})
-            
-            resultado = crear_evento(
-                titulo=entidades.get('titulo', 'Evento sin título'),
-                fecha_inicio=fecha_inicio,
-                duracion_minutos=entidades.get('duracion_minutos', 60),
-                ubicacion=entidades.get('ubicacion', ''),
-                participantes=entidades.get('participantes', [])
-            )
-            
-            if resultado.get('success'):
-                return generar_respuesta('evento_creado', {
-                    'titulo': resultado['titulo'],
-                    'fecha': fecha_inicio.strftime('%d/%m/%Y'),
-                    'hora': fecha_inicio.strftime('%H:%M'),
-                    'id': resultado['id']
-                }, incluir_fuente=True)
-            else:
-                return generar_respuesta('error', {'mensaje': resultado.get('error')})
+    def __init__(self, ttl: float = EVENTOS_TTL, max_resultados: int = 50):
+        self.ttl = ttl
+        self.max_resultados = max_resultados
+        self.ts = float('-inf')
+        self.events: List[Dict[str, Any]] = []
+        self.by_token: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        # Títulos en minúsculas unidos por '\0' y la posición de inicio de cada uno
+        self._titulos = ''
+        self._offsets: List[int] = []
+        self._lock = asyncio.Lock()
+    
+    async def get(self, horizon_days: int = 7) -> List[Dict[str, Any]]:
+        """Devuelve los próximos eventos, refrescándolos si expiró el TTL."""
+        async with self._lock:
+            if time.monotonic() - self.ts > self.ttl:
+                ahora = datetime.now()
+                eventos = await listar_eventos_async(
+                    fecha_inicio=ahora,
+                    fecha_fin=ahora + timedelta(days=horizon_days),
+                    max_resultados=self.max_resultados
+                )
+                by_token = defaultdict(list)
+                offsets = []
+                posicion = 0
+                for e in eventos:
+                    e['titulo_lower'] = _norm(e['titulo'])
+                    for palabra in set(e['titulo_lower'].split()):
+                        by_token[palabra].append(e)
+                    offsets.append(posicion)
+                    posicion += len(e['titulo_lower']) + 1
+                self.events, self.by_token = eventos, by_token
+                self._titulos = '\0'.join(e['titulo_lower'] for e in eventos)
+                self._offsets = offsets
+                self.ts = time.monotonic()
+        return self.events
+    
+    def invalidar(self):
+        """Fuerza a recargar los eventos en la próxima consulta."""
+        self.ts = float('-inf')
+    
+    async def buscar(self, evento_ref: str) -> Optional[Dict[str, Any]]:
+        """
+        Busca un evento cuyo título contenga evento_ref (ya normalizado con _norm).
+        Primero mira los candidatos del índice y luego recorre la lista completa.
+        Una referencia vacía no coincide con ningún evento.
+        """
+        if not evento_ref:
+            return None
         
-        elif intencion == 'consultar_eventos':
-            fecha_str = entidades.get('fecha_resuelta', entidades.get('fecha'))
-            if fecha_str:
-                fecha = datetime.strptime(fecha_str, "%Y-%m-%d")
-            else:
-                fecha = datetime.now()
-            
-            eventos = listar_eventos(fecha_inicio=fecha, max_resultados=5)
-            lista = formatear_lista_eventos(eventos)
-            
-            return f"📅 Eventos del {fecha.strftime('%d/%m/%Y')}:\n\n{lista}"
+        eventos = await self.get()
         
-        elif intencion == 'disponibilidad':
-            fecha_str = entidades.get('fecha_resuelta', entidades.get('fecha'))
-            hora_str = entidades.get('hora', '09:00')
-            
-            if fecha_str:
-                fecha = datetime.strptime(f"{fecha_str} {hora_str}", "%Y-%m-%d %H:%M")
-            else:
-                fecha = datetime.now()
-            
-            resultado = buscar_disponibilidad(fecha)
-            
-            if resultado['disponible']:
-                return generar_respuesta('disponible', {
-                    'fecha': fecha.strftime('%d/%m/%Y'),
-                    'hora': fecha.strftime('%H:%M')
-                })
-            else:
-                return generar_respuesta('no_disponible', {
-                    'conflictos': resultado['mensaje']
-                })
+        palabras = evento_ref.split()
+        if palabras:
+            for e in self.by_token.get(palabras[0], ()):
+                if evento_ref in e['titulo_lower']:
+                    return e
         
-        elif intencion == 'eliminar_evento':
-            # Buscar evento por referencia
-            eventos = listar_eventos(max_resultados=10)
-            evento_ref = entidades.get('evento_referencia', '').lower()
-            
-            evento_encontrado = None
-            for e in eventos:
-                if evento_ref in e['titulo'].lower():
-                    evento_encontrado = e
-                    break
-            
-            if evento_encontrado:
-                resultado = eliminar_evento(evento_encontrado['id'])
-                if resultado.get('success'):
-                    return generar_respuesta('evento_eliminado', {
-                        'titulo': evento_encontrado['titulo']
-                    })
-                else:
-                    return generar_respuesta('error', {'mensaje': resultado.get('error')})
-            else:
-                return generar_respuesta('error', {
-                    'mensaje': f'No encontré un evento que coincida con "{evento_ref}"'
-                })
+        # Con muchos eventos, una sola búsqueda en C sobre el buffer
+        if len(eventos) > BUSQUEDA_BUFFER_MIN and '\0' not in evento_ref:
+            posicion = self._titulos.find(evento_ref)
+            if posicion == -1:
+                return None
+            return eventos[bisect_right(self._offsets, posicion) - 1]
         
-        elif intencion == 'editar_evento' or intencion == 'mover_evento':
-            # Similar a eliminar, buscar y editar
-            eventos = listar_eventos(max_resultados=10)
-            evento_ref = entidades.get('evento_referencia', '').lower()
-            
-            evento_encontrado = None
-            for e in eventos:
-                if evento_ref in e['titulo'].lower():
-                    evento_encontrado = e
-                    break
-            
-            if not evento_encontrado:
-                return generar_respuesta('error', {
-                    'mensaje': f'No encontré un evento que coincida con "{evento_ref}"'
-                })
-            
-            # Construir nueva fecha si se proporciona
-            nueva_fecha = None
-            fecha_str = entidades.get('fecha_resuelta', entidades.get('fecha'))
-            hora_str = entidades.get('hora')
-            
-            if fecha_str and hora_str:
-                nueva_fecha = datetime.strptime(f"{fecha_str} {hora_str}", "%Y-%m-%d %H:%M")
-            elif fecha_str:
-                nueva_fecha = datetime.strptime(fecha_str, "%Y-%m-%d")
-            
-            resultado = editar_evento(
-                evento_id=evento_encontrado['id'],
-                nuevo_titulo=entidades.get('titulo'),
-                nueva_fecha=nueva_fecha,
-                nueva_ubicacion=entidades.get('ubicacion')
-            )
-            
-            if resultado.get('success'):
-                return generar_respuesta('evento_editado', {
-                    'titulo': evento_encontrado['titulo']
-                })
-            else:
-                return generar_respuesta('error', {'mensaje': resultado.get('error')})
+        for e in eventos:
+            if evento_ref in e['titulo_lower']:
+                return e
         
-        else:
-            return generar_respuesta('fuera_alcance', {})
+        return None
+
+
+_events_cache = _EventsCache()
+
+
+def _parse_fecha_hora(fecha_str: str, hora_str: Optional[str] = None) -> datetime:
+    """Como _convertir_fecha_hora, con caché acotada (FIFO) de resultados."""
+    clave = (fecha_str, hora_str)
+    fecha = _fechas_cache.get(clave)
+    if fecha is None:
+        fecha = _convertir_fecha_hora(fecha_str, hora_str)
+        if len(_fechas_cache) >= FECHAS_CACHE_MAX:
+            del _fechas_cache[next(iter(_fechas_cache))]
+        _fechas_cache[clave] = fecha
+    return fecha
+
+
+def _convertir_fecha_hora(fecha_str: str, hora_str: Optional[str] = None) -> datetime:
+    """
+    Convierte fecha (YYYY-MM-DD) y hora (HH:MM) opcional en datetime.
+    Usa fromisoformat y solo recurre a strptime si la entrada no es ISO
+    (p. ej. horas de un dígito como "9:00").
+    """
+    try:
+        if hora_str:
+            return datetime.fromisoformat(f"{fecha_str}T{hora_str}:00")
+        return datetime.fromisoformat(fecha_str)
+    except ValueError:
+        if hora_str:
+            return datetime.strptime(f"{fecha_str} {hora_str}", "%Y-%m-%d %H:%M")
+        return datetime.strptime(fecha_str, "%Y-%m-%d")
+
+
+async def _handle_crear(entidades: Dict[str, Any], now: datetime) -> Respuesta:
+    """Crea un evento nuevo."""
+    get = entidades.get
+    fecha_str = get('fecha_resuelta') or get('fecha')
+    hora_str = get('hora', '09:00')
+    
+    # Construir fecha/hora
+    if fecha_str and hora_str:
+        fecha_inicio = _parse_fecha_hora(fecha_str, hora_str)
+    else:
+        return Respuesta('error', {'mensaje': 'Necesito saber la fecha y hora'})
+    
+    resultado = await crear_evento_async(
+        titulo=get('titulo', 'Evento sin título'),
+        fecha_inicio=fecha_inicio,
+        duracion_minutos=get('duracion_minutos', 60),
+        ubicacion=get('ubicacion', ''),
+        participantes=get('participantes', [])
+    )
+    
+    if resultado.success:
+        _events_cache.invalidar()
+        return Respuesta('evento_creado', {
+            'titulo': resultado.titulo,
+            'fecha': fecha_inicio.strftime(FORMATO_FECHA),
+            'hora': fecha_inicio.strftime(FORMATO_HORA),
+            'id': resultado.id
+        }, incluir_fuente=True)
+    else:
+        return Respuesta('error', {'mensaje': resultado.error})
+
+
+async def _handle_consultar(entidades: Dict[str, Any], now: datetime) -> Respuesta:
+    """Lista los eventos de una fecha (o los próximos)."""
+    fecha_str = entidades.get('fecha_resuelta') or entidades.get('fecha')
+    
+    if fecha_str:
+        fecha = _parse_fecha_hora(fecha_str)
+        eventos = await listar_eventos_async(fecha_inicio=fecha, max_resultados=5)
+    else:
+        # Sin fecha: los próximos eventos ya están en caché
+        fecha = now
+        eventos = (await _events_cache.get())[:5]
+    lista = formatear_lista_eventos(eventos)
+    
+    return Respuesta(texto=_TPL_CONSULTA % (fecha.strftime(FORMATO_FECHA), lista))
+
+
+async def _handle_disponibilidad(entidades: Dict[str, Any], now: datetime) -> Respuesta:
+    """Verifica si hay un hueco libre en una fecha/hora."""
+    get = entidades.get
+    fecha_str = get('fecha_resuelta') or get('fecha')
+    hora_str = get('hora', '09:00')
+    
+    if fecha_str and not hora_str:
+        return Respuesta('error', {'mensaje': 'Necesito saber la fecha y hora'})
     
+    if fecha_str:
+        fecha = _parse_fecha_hora(fecha_str, hora_str)
+    else:
+        fecha = now
+    
+    resultado = await buscar_disponibilidad_async(fecha)
+    
+    if resultado['disponible']:
+        return Respuesta('disponible', {
+            'fecha': fecha.strftime(FORMATO_FECHA),
+            'hora': fecha.strftime(FORMATO_HORA)
+        })
+    else:
+        return Respuesta('no_disponible', {
+            'conflictos': resultado['mensaje']
+        })
+
+
+async def _handle_eliminar(entidades: Dict[str, Any], now: datetime) -> Respuesta:
+    """Elimina el evento que coincide con la referencia."""
+    ref = entidades.get('evento_referencia') or ''
+    
+    # Buscar evento por referencia
+    evento_encontrado = await _events_cache.buscar(_norm(ref))
+    
+    if not evento_encontrado:
+        return Respuesta('error', {
+            'mensaje': f'No encontré un evento que coincida con "{ref}"'
+        })
+    
+    resultado = await eliminar_evento_async(
+        evento_encontrado['id'],
+        titulo=evento_encontrado['titulo']
+    )
+    if resultado.success:
+        _events_cache.invalidar()
+        return Respuesta('evento_eliminado', {
+            'titulo': evento_encontrado['titulo']
+        })
+    else:
+        return Respuesta('error', {'mensaje': resultado.error})
+
+
+async def _handle_editar(entidades: Dict[str, Any], now: datetime) -> Respuesta:
+    """Edita o mueve el evento que coincide con la referencia."""
+    get = entidades.get
+    ref = get('evento_referencia') or ''
+    
+    # Similar a eliminar, buscar y editar
+    evento_encontrado = await _events_cache.buscar(_norm(ref))
+    
+    if not evento_encontrado:
+        return Respuesta('error', {
+            'mensaje': f'No encontré un evento que coincida con "{ref}"'
+        })
+    
+    # Construir nueva fecha si se proporciona
+    nueva_fecha = None
+    fecha_str = get('fecha_resuelta') or get('fecha')
+    hora_str = get('hora')
+    
+    if fecha_str and hora_str:
+        nueva_fecha = _parse_fecha_hora(fecha_str, hora_str)
+    elif fecha_str:
+        nueva_fecha = _parse_fecha_hora(fecha_str)
+    
+    resultado = await editar_evento_async(
+        evento_id=evento_encontrado['id'],
+        nuevo_titulo=get('titulo'),
+        nueva_fecha=nueva_fecha,
+        nueva_ubicacion=get('ubicacion')
+    )
+    
+    if resultado.success:
+        _events_cache.invalidar()
+        return Respuesta('evento_editado', {
+            'titulo': evento_encontrado['titulo']
+        })
+    else:
+        return Respuesta('error', {'mensaje': resultado.error})
+
+
+async def _handle_fuera_alcance(entidades: Dict[str, Any], now: datetime) -> Respuesta:
+    """Respuesta para intenciones que no son de calendario."""
+    return Respuesta('fuera_alcance', {})
+
+
+# Despacho de intenciones a su handler
+_HANDLERS: Dict[str, Callable[[Dict[str, Any], datetime], Awaitable[Respuesta]]] = {
+    'crear_evento': _handle_crear,
+    'consultar_eventos': _handle_consultar,
+    'disponibilidad': _handle_disponibilidad,
+    'eliminar_evento': _handle_eliminar,
+    'editar_evento': _handle_editar,
+    'mover_evento': _handle_editar,
+}
+
+
+async def ejecutar_accion(
+    intencion: str,
+    entidades: Dict[str, Any],
+    now: Optional[datetime] = None
+) -> Respuesta:
+    """Ejecuta una acción de calendario y retorna la respuesta a enviar."""
+    if now is None:
+        now = datetime.now()
+    
+    handler = _HANDLERS.get(intencion, _handle_fuera_alcance)
+    try:
+        return await handler(entidades, now)
     except Exception as e:
-        logger.error(f"Error ejecutando acción: {e}")
-        return generar_respuesta('error', {'mensaje': str(e)})
+        logger.error("Error ejecutando acción: %s", e)
+        return Respuesta('error', {'mensaje': str(e)})
 
 
 def setup_bot():
@@ -6,20 +6,33 @@ Ejecuta el bot de Telegram y servidor FastAPI para OAuth.
 import asyncio
 import os
 from pathlib import Path
+from string import Template
 
 from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse
 import uvicorn
 from dotenv import load_dotenv
-from telegram import Update
 
-from contextlib import asynccontextmanager
+# uvloop es opcional: acelera el event loop de uvicorn y del bot
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+# orjson es opcional: si está instalado, FastAPI serializa las respuestas con él
+try:
+    import orjson
+    DefaultResponse = ORJSONResponse
+except ImportError:
+    DefaultResponse = JSONResponse
 
-from google.auth.transport.requests import Request as GoogleRequest
-from google_auth_oauthlib.flow import Flow
+from contextlib import asynccontextmanager
 
 # Importar el setup_bot del módulo de Telegram
 from ejecucion.telegram_bot import setup_bot
+from ejecucion.calendar_service import guardar_token, invalidar_servicio
 
 load_dotenv()
 
@@ -33,6 +46,50 @@ SCOPES = ['https://www.googleapis.com/auth/calendar']
 BASE_URL = os.getenv("BASE_URL", "http://localhost:8000")
 RAILWAY_PORT = os.getenv("PORT", "8000") # Puerto que Railway asigna
 
+# Página de autorización (solo cambia el enlace)
+AUTORIZAR_HTML = Template("""
+    <html>
+        <head><title>Autorizar SekretariaBot</title></head>
+        <body style="font-family: Arial; text-align: center; padding: 50px;">
+            <h1>🔐 Autorizar Google Calendar</h1>
+            <p>Haz clic para autorizar el acceso:</p>
+            <a href="$auth_url" style="
+                display: inline-block;
+                padding: 15px 30px;
+                background: #4285f4;
+                color: white;
+                text-decoration: none;
+                border-radius: 5px;
+                font-size: 18px;
+            ">Autorizar con Google</a>
+        </body>
+    </html>
+    """)
+
+
+def leer_client_config():
+    """
+    Construye la configuración del cliente OAuth desde variables de entorno.
+    Retorna None si faltan CLIENTID o GOOGLE_CALENDAR_SECRET.
+    """
+    client_id = os.getenv("CLIENTID")
+    client_secret = os.getenv("GOOGLE_CALENDAR_SECRET")
+    
+    if not client_id or not client_secret:
+        return None
+    
+    return {
+        "web": {
+            "client_id": client_id,
+            "client_secret": client_secret,
+            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+            "token_uri": "https://oauth2.googleapis.com/token",
+            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+            "redirect_uris": [f"{BASE_URL}/oauth2/callback"],
+        }
+    }
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -43,6 +100,9 @@ async def lifespan(app: FastAPI):
     print("🤖 SekretariaBot - Iniciando componentes")
     print("=" * 50)
     
+    # Configuración OAuth (se lee una sola vez)
+    app.state.client_config = leer_client_config()
+    
     # Configurar e iniciar bot de Telegram
     bot_app = setup_bot()
     if bot_app:
@@ -70,13 +130,16 @@ async def lifespan(app: FastAPI):
         print("✅ Bot de Telegram detenido.")
         print("=" * 50)
 
-app = FastAPI(title="SekretariaBot API", lifespan=lifespan)
+app = FastAPI(
+    title="SekretariaBot API",
+    lifespan=lifespan,
+    default_response_class=DefaultResponse,
+)
 
 # Estado global para el flujo OAuth
 oauth_flow = None
 
 
-
 @app.get("/")
 def root():
     """Health check."""
@@ -87,24 +150,12 @@ def root():
 def iniciar_autorizacion():
     """Inicia el flujo OAuth de Google Calendar usando variables de entorno."""
     global oauth_flow
+    # Import diferido: solo se necesita al autorizar
+    from google_auth_oauthlib.flow import Flow
 
-    client_id = os.getenv("CLIENTID")
-    client_secret = os.getenv("GOOGLE_CALENDAR_SECRET")
-
-    if not client_id or not client_secret:
+    client_config = app.state.client_config
+    if not client_config:
         return {"error": "CLIENTID o GOOGLE_CALENDAR_SECRET (Client Secret) no configurados en el entorno."}
-
-    # Construir la configuración del cliente para el flujo OAuth desde variables de entorno
-    client_config = {
-        "web": {
-            "client_id": client_id,
-            "client_secret": client_secret,
-            "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-            "token_uri": "https://oauth2.googleapis.com/token",
-            "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-            "redirect_uris": [f"{BASE_URL}/oauth2/callback"],
-        }
-    }
     
     oauth_flow = Flow.from_client_config(
         client_config=client_config,
@@ -118,127 +169,63 @@ def iniciar_autorizacion():
         prompt='consent'
     )
     
-    return HTMLResponse(f"""
-    <html>
-        <head><title>Autorizar SekretariaBot</title></head>
-        <body style="font-family: Arial; text-align: center; padding: 50px;">
-            <h1>🔐 Autorizar Google Calendar</h1>
-            <p>Haz clic para autorizar el acceso:</p>
-            <a href="{auth_url}" style="
-                display: inline-block;
-                padding: 15px 30px;
-                background: #4285f4;
-                color: white;
-                text-decoration: none;
-                border-radius: 5px;
-                font-size: 18px;
-            ">Autorizar con Google</a>
-        </body>
-    </html>
-    """)
-    
-    
-    
-    
-    
-    @app.get("/oauth2/callback")
-    
-    def oauth_callback(request: Request):
-    
-        """Callback de OAuth - recibe el código de autorización."""
-    
-        global oauth_flow
-    
-        
-    
-        code = request.query_params.get("code")
-    
-        error = request.query_params.get("error")
-    
-        
-    
-        if error:
-    
-            return HTMLResponse(f"""
-    
-            <html><body style="font-family: Arial; text-align: center; padding: 50px;">
-    
-                <h1>❌ Error</h1>
-    
-                <p>{error}</p>
-    
-            </body></html>
+    return HTMLResponse(AUTORIZAR_HTML.substitute(auth_url=auth_url))
+
+
+@app.get("/oauth2/callback")
+def oauth_callback(request: Request):
+    """Callback de OAuth - recibe el código de autorización."""
+    global oauth_flow
     
-            """)
+    code = request.query_params.get("code")
+    error = request.query_params.get("error")
     
-        
+    if error:
+        return HTMLResponse(f"""
+        <html><body style="font-family: Arial; text-align: center; padding: 50px;">
+            <h1>❌ Error</h1>
+            <p>{error}</p>
+        </body></html>
+        """)
     
-        if not code:
+    if not code:
+        return {"error": "No se recibió código de autorización"}
     
-            return {"error": "No se recibió código de autorización"}
+    if not oauth_flow:
+        return {"error": "Flujo OAuth no iniciado. Ve a /autorizar primero."}
     
+    try:
+        # Intercambiar código por token
+        oauth_flow.fetch_token(code=code)
+        creds = oauth_flow.credentials
         
-    
-        if not oauth_flow:
-    
-            return {"error": "Flujo OAuth no iniciado. Ve a /autorizar primero."}
-    
+        # Guardar token
+        guardar_token(creds, TOKEN_FILE)
+        invalidar_servicio()
         
-    
-        try:
-    
-            # Intercambiar código por token
-    
-            oauth_flow.fetch_token(code=code)
-    
-            creds = oauth_flow.credentials
-    
-            
-    
-            # Guardar token
-    
-            with open(TOKEN_FILE, 'w') as token:
-    
-                token.write(creds.to_json())
-    
-            
-    
-            return HTMLResponse(f"""
-    
-            <html><body style="font-family: Arial; text-align: center; padding: 50px;">
-    
-                <h1>✅ ¡Autorización exitosa!</h1>
-    
-                <p>Token guardado en <code>token.json</code></p>
-    
-                <p>Ya puedes usar el bot de Telegram para gestionar tu calendario.</p>
-    
-            </body></html>
-    
-            """)
-    
-        except Exception as e:
-    
-            return HTMLResponse(f"""
-    
-            <html><body style="font-family: Arial; text-align: center; padding: 50px;">
-    
-                <h1>❌ Error</h1>
-    
-                <p>{str(e)}</p>
-    
-            </body></html>
-    
-            """)
-    
-    
-    
-    
-    
-    if __name__ == '__main__':
-    
-        # Usamos uvicorn para correr la aplicación.
-    
-        # El bot se iniciará en el manejador de ciclo de vida 'lifespan'.
-    
-        uvicorn.run(app, host="0.0.0.0", port=int(RAILWAY_PORT), log_level="info")
+        return HTMLResponse(f"""
+        <html><body style="font-family: Arial; text-align: center; padding: 50px;">
+            <h1>✅ ¡Autorización exitosa!</h1>
+            <p>Token guardado en <code>token.json</code></p>
+            <p>Ya puedes usar el bot de Telegram para gestionar tu calendario.</p>
+        </body></html>
+        """)
+    except Exception as e:
+        return HTMLResponse(f"""
+        <html><body style="font-family: Arial; text-align: center; padding: 50px;">
+            <h1>❌ Error</h1>
+            <p>{str(e)}</p>
+        </body></html>
+        """)
+
+
+if __name__ == '__main__':
+    # Usamos uvicorn para correr la aplicación.
+    # El bot se iniciará en el manejador de ciclo de vida 'lifespan'.
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=int(RAILWAY_PORT),
+        log_level="info",
+        loop="uvloop" if UVLOOP_AVAILABLE else "asyncio",
+    )